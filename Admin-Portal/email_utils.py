@@ -14,13 +14,25 @@ from __future__ import annotations
 #   FROM_EMAIL (default: SMTP_USER)
 #   INTERNAL_NOTIFY_EMAIL (or ORDER_NOTIFY_EMAIL)
 #   BCC_EMAIL (optional)
+#   SMTP_POOL_SIZE (idle connections kept open, default 2)
+#   SMTP_MAX_MESSAGES_PER_CONN (reconnect after this many sends, default 100)
+#   SMTP_TIMEOUT (seconds per socket operation, default 30; a hung server or
+#     half-open pooled session fails the send instead of stalling the sender)
+#
+# submit_mail_task() runs work (PDF build + send) on a background thread so the
+# SMTP round-trips don't hold up the request that took the order.
 # =========================================
 
 import os
 import mimetypes
+import queue
 import smtplib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from email.message import EmailMessage
-from typing import Optional
+from io import BytesIO
+from functools import lru_cache
+from typing import NamedTuple, Optional
 
 
 def _cfg(app, key: str, default=None):
@@ -38,6 +50,37 @@ def _as_bool(val) -> bool:
     return str(val).strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
+class SmtpConfig(NamedTuple):
+    host: Optional[str]
+    port: int
+    user: Optional[str]
+    password: Optional[str]
+    use_tls: bool
+    use_ssl: bool
+    from_email: Optional[str]
+    internal_to: Optional[str]
+    bcc: Optional[str]
+    timeout: float
+
+
+@lru_cache(maxsize=None)
+def _smtp_settings(app) -> SmtpConfig:
+    # Resolved once per app (or once for app=None); config changes need a restart
+    user = _cfg(app, "SMTP_USER")
+    return SmtpConfig(
+        host=_cfg(app, "SMTP_HOST"),
+        port=int(_cfg(app, "SMTP_PORT", 587)),
+        user=user,
+        password=_cfg(app, "SMTP_PASS"),
+        use_tls=_as_bool(_cfg(app, "SMTP_USE_TLS", True)),
+        use_ssl=_as_bool(_cfg(app, "SMTP_USE_SSL", False)),
+        from_email=_cfg(app, "FROM_EMAIL", user),
+        internal_to=_cfg(app, "INTERNAL_NOTIFY_EMAIL", _cfg(app, "ORDER_NOTIFY_EMAIL")),
+        bcc=_cfg(app, "BCC_EMAIL", None),
+        timeout=float(_cfg(app, "SMTP_TIMEOUT", 30)),
+    )
+
+
 def _build_internal_subject(order: dict) -> str:
     return f"[Crown] New {order.get('order_type','').upper()} order - {order.get('order_id','')}"
 
@@ -88,53 +131,138 @@ def _build_customer_body(order: dict) -> str:
 
 
 
-def _attach_uploaded_files(msg: EmailMessage, paths: list[str]) -> None:
-    """Attach uploaded files (if they exist) to the given EmailMessage."""
-    for p in (paths or []):
-        if not p:
-            continue
+# Formats that are already compressed go into the bundle as-is (ZIP_STORED)
+_STORE_EXTS = (".zip", ".rar", ".pdf", ".png", ".jpg", ".jpeg", ".webp")
+
+
+def _upload_attachments(paths: list[str], bundle_name: str) -> list[tuple[bytes, str, str, str]]:
+    """
+    Read the uploaded files (if they exist) once, as (data, maintype, subtype, filename)
+    attachments shared by both emails. Two or more files go out as a single zip
+    named bundle_name: one MIME part and one base64 pass instead of N.
+    """
+    paths = [p for p in (paths or []) if p and os.path.exists(p)]
+    if len(paths) == 1:
+        p = paths[0]
         try:
-            if not os.path.exists(p):
-                continue
-            ctype, enc = mimetypes.guess_type(p)
-            if ctype is None or enc is not None:
-                ctype = "application/octet-stream"
-            maintype, subtype = ctype.split("/", 1)
             with open(p, "rb") as f:
-                msg.add_attachment(
-                    f.read(),
-                    maintype=maintype,
-                    subtype=subtype,
-                    filename=os.path.basename(p),
-                )
-        except Exception:
-            # don't fail the entire email just because one attachment is bad
-            continue
-
-def _send_email(
-    host: str,
-    port: int,
-    user: Optional[str],
-    password: Optional[str],
-    use_tls: bool,
-    use_ssl: bool,
-    msg: EmailMessage,
-):
-    if use_ssl:
-        with smtplib.SMTP_SSL(host, port) as s:
-            if user and password:
-                s.login(user, password)
-            s.send_message(msg)
-        return
-
-    with smtplib.SMTP(host, port) as s:
-        s.ehlo()
-        if use_tls:
-            s.starttls()
+                data = f.read()
+        except OSError:
+            return []
+        ctype, enc = mimetypes.guess_type(p)
+        if ctype is None or enc is not None:
+            ctype = "application/octet-stream"
+        maintype, subtype = ctype.split("/", 1)
+        return [(data, maintype, subtype, os.path.basename(p))]
+    if not paths:
+        return []
+
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=3) as z:
+        for p in paths:
+            try:
+                stored = p.lower().endswith(_STORE_EXTS)
+                z.write(p, arcname=os.path.basename(p),
+                        compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+            except OSError:
+                # don't fail the entire email just because one attachment is bad
+                continue
+    return [(buf.getvalue(), "application", "zip", bundle_name)]
+
+
+def _attach(msg: EmailMessage, attachments: list[tuple[bytes, str, str, str]]) -> None:
+    for data, maintype, subtype, filename in attachments:
+        msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+
+def _open_smtp(cfg: SmtpConfig) -> smtplib.SMTP:
+    """Connect, secure and log in."""
+    if cfg.use_ssl:
+        s = smtplib.SMTP_SSL(cfg.host, cfg.port, timeout=cfg.timeout)
+    else:
+        s = smtplib.SMTP(cfg.host, cfg.port, timeout=cfg.timeout)
+    try:
+        if not cfg.use_ssl:
             s.ehlo()
-        if user and password:
-            s.login(user, password)
-        s.send_message(msg)
+            if cfg.use_tls:
+                s.starttls()
+                s.ehlo()
+        if cfg.user and cfg.password:
+            s.login(cfg.user, cfg.password)
+    except Exception:
+        s.close()
+        raise
+    return s
+
+
+def _close_quietly(conn: smtplib.SMTP) -> None:
+    try:
+        conn.quit()
+    except Exception:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _is_alive(conn: smtplib.SMTP) -> bool:
+    try:
+        return conn.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+class SMTPPool:
+    """
+    Logged-in SMTP sessions kept open between orders, so a send usually skips
+    the TCP/TLS handshake and AUTH. Idle sessions are NOOP-checked on checkout
+    and retired after max_messages sends (providers cap messages per session).
+    """
+
+    def __init__(self, maxsize: int = 2, max_messages: int = 100):
+        self._idle: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.max_messages = max_messages
+
+    def _checkout(self, cfg: SmtpConfig) -> tuple[smtplib.SMTP, int]:
+        while True:
+            try:
+                conn, conn_cfg, sent = self._idle.get_nowait()
+            except queue.Empty:
+                return _open_smtp(cfg), 0
+            if conn_cfg == cfg and _is_alive(conn):
+                return conn, sent
+            _close_quietly(conn)
+
+    def _checkin(self, conn: smtplib.SMTP, cfg: SmtpConfig, sent: int) -> None:
+        if sent >= self.max_messages:
+            _close_quietly(conn)
+            return
+        try:
+            self._idle.put_nowait((conn, cfg, sent))
+        except queue.Full:
+            _close_quietly(conn)
+
+    def send(self, cfg: SmtpConfig, messages: list[EmailMessage]) -> None:
+        conn, sent = self._checkout(cfg)
+        try:
+            for msg in messages:
+                try:
+                    conn.send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # Dropped between the NOOP and the send: one retry on a fresh session
+                    _close_quietly(conn)
+                    conn, sent = _open_smtp(cfg), 0
+                    conn.send_message(msg)
+                sent += 1
+        except Exception:
+            _close_quietly(conn)
+            raise
+        self._checkin(conn, cfg, sent)
+
+
+_smtp_pool = SMTPPool(
+    maxsize=int(os.getenv("SMTP_POOL_SIZE", "2")),
+    max_messages=int(os.getenv("SMTP_MAX_MESSAGES_PER_CONN", "100")),
+)
 
 
 def send_order_emails(order: dict, items: list[dict], pdf_bytes: bytes, uploaded_paths: list[str]) -> bool:
@@ -149,24 +277,20 @@ def send_order_emails(order: dict, items: list[dict], pdf_bytes: bytes, uploaded
     except Exception:
         app = None
 
-    smtp_host = _cfg(app, "SMTP_HOST")
-    smtp_port = int(_cfg(app, "SMTP_PORT", 587))
-    smtp_user = _cfg(app, "SMTP_USER")
-    smtp_pass = _cfg(app, "SMTP_PASS")
-    use_tls = _as_bool(_cfg(app, "SMTP_USE_TLS", True))
-    use_ssl = _as_bool(_cfg(app, "SMTP_USE_SSL", False))
-
-    from_email = _cfg(app, "FROM_EMAIL", smtp_user)
-    internal_to = _cfg(app, "INTERNAL_NOTIFY_EMAIL", _cfg(app, "ORDER_NOTIFY_EMAIL"))
-    bcc_email = _cfg(app, "BCC_EMAIL", None)
+    cfg = _smtp_settings(app)
+    from_email = cfg.from_email
+    internal_to = cfg.internal_to
+    bcc_email = cfg.bcc
 
-    if not smtp_host:
+    if not cfg.host:
         raise RuntimeError("SMTP_HOST is not configured")
     if not from_email:
         raise RuntimeError("FROM_EMAIL (or SMTP_USER) is not configured")
     if not internal_to:
         raise RuntimeError("INTERNAL_NOTIFY_EMAIL (or ORDER_NOTIFY_EMAIL) is not configured")
 
+    uploads = _upload_attachments(uploaded_paths, f"order_{order.get('order_id','')}_files.zip")
+
     # ---- Internal notification
     internal_msg = EmailMessage()
     internal_msg["Subject"] = _build_internal_subject(order)
@@ -184,18 +308,10 @@ def send_order_emails(order: dict, items: list[dict], pdf_bytes: bytes, uploaded
         filename=f"order_{order.get('order_id','')}.pdf",
     )
 
-    _attach_uploaded_files(internal_msg, uploaded_paths)
-    _send_email(
-        host=smtp_host,
-        port=smtp_port,
-        user=smtp_user,
-        password=smtp_pass,
-        use_tls=use_tls,
-        use_ssl=use_ssl,
-        msg=internal_msg,
-    )
+    _attach(internal_msg, uploads)
 
     # ---- Customer confirmation (best-effort; still raise if configured but fails)
+    customer_msg = None
     cust_email = (order.get("email") or "").strip()
     if cust_email:
         customer_msg = EmailMessage()
@@ -214,15 +330,34 @@ def send_order_emails(order: dict, items: list[dict], pdf_bytes: bytes, uploaded
             filename=f"order_{order.get('order_id','')}.pdf",
         )
 
-        _attach_uploaded_files(customer_msg, uploaded_paths)
-        _send_email(
-            host=smtp_host,
-            port=smtp_port,
-            user=smtp_user,
-            password=smtp_pass,
-            use_tls=use_tls,
-            use_ssl=use_ssl,
-            msg=customer_msg,
-        )
+        _attach(customer_msg, uploads)
+
+    # Both messages go out on one pooled session, usually already logged in
+    _smtp_pool.send(cfg, [m for m in (internal_msg, customer_msg) if m is not None])
+
+    return True
+
+
+# One sender thread per process: orders are rare, and a single thread keeps
+# sends ordered and the SMTP server from seeing bursts of parallel logins.
+_mail_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-mail")
+
+
+def _run_in_app_context(app, fn, args) -> None:
+    with app.app_context():
+        try:
+            fn(*args)
+        except Exception:
+            app.logger.exception("Background mail task %s failed", getattr(fn, "__name__", fn))
+
+
+def submit_mail_task(fn, *args):
+    """
+    Run fn(*args) on the background sender and return immediately.
+    Must be called inside a Flask app context; fn runs in a fresh one.
+    Failures are logged, not raised.
+    """
+    from flask import current_app
 
-    return True
\ No newline at end of file
+    app = current_app._get_current_object()
+    return _mail_executor.submit(_run_in_app_context, app, fn, args)
@@ -1,6 +1,7 @@
 import logging
 from logging.config import fileConfig
 
+import sqlalchemy as sa
 from flask import current_app
 
 from alembic import context
@@ -90,21 +91,49 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # JSON columns are plain TEXT on SQLite (the upgrade doesn't rebuild job
+    # just to relabel them), so don't report TEXT vs JSON there as a change.
+    def compare_type(context, inspected_column, metadata_column,
+                     inspected_type, metadata_type):
+        if (context.dialect.name == 'sqlite'
+                and isinstance(metadata_type, sa.JSON)
+                and isinstance(inspected_type, sa.Text)):
+            return False
+        return None
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("compare_type") in (None, True):
+        conf_args["compare_type"] = compare_type
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # The app's connect hook turns SQLite foreign keys on. Batch mode
+        # rebuilds tables by DROP + rename, and with ON DELETE CASCADE children
+        # that DROP would empty them, so migrate with foreign keys off. The
+        # pragma is a no-op inside a transaction, hence before begin.
+        sqlite = connection.dialect.name == "sqlite"
+        if sqlite:
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
             **conf_args
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        try:
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if sqlite:
+                # back to the app's setting before the connection returns to the pool
+                connection.rollback()
+                connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                connection.commit()
 
 
 if context.is_offline_mode():
@@ -0,0 +1,39 @@
+"""Intake payload columns as JSON; unique intake_order_id index
+
+Revision ID: 2a6c4e8f0b35
+Revises: 7f3b8d1e5a24
+Create Date: 2026-10-15 16:05:44.271390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a6c4e8f0b35'
+down_revision = '7f3b8d1e5a24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Stored values are already JSON text, so only the declared type changes.
+    # SQLite stores JSON as TEXT anyway; there the change would only force a
+    # batch rebuild of job, so it's skipped.
+    if op.get_bind().dialect.name != 'sqlite':
+        with op.batch_alter_table('job', schema=None) as batch_op:
+            batch_op.alter_column('submission_json', existing_type=sa.Text(), type_=sa.JSON(), existing_nullable=True)
+            batch_op.alter_column('uploaded_files_json', existing_type=sa.Text(), type_=sa.JSON(), existing_nullable=True)
+
+    # /init-db used to create the unique index by hand; databases that never hit
+    # that path only have the plain one. The unique index serves lookups too.
+    op.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_job_intake_order_id ON job (intake_order_id)')
+    op.execute('DROP INDEX IF EXISTS ix_job_intake_order_id')
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.create_index('ix_job_intake_order_id', ['intake_order_id'], unique=False)
+        if op.get_bind().dialect.name != 'sqlite':
+            batch_op.alter_column('uploaded_files_json', existing_type=sa.JSON(), type_=sa.Text(), existing_nullable=True)
+            batch_op.alter_column('submission_json', existing_type=sa.JSON(), type_=sa.Text(), existing_nullable=True)
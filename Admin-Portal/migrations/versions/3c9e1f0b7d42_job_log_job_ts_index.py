@@ -0,0 +1,28 @@
+"""Composite (job_id, timestamp) index on job_log
+
+Revision ID: 3c9e1f0b7d42
+Revises: a751120aa9cb
+Create Date: 2026-10-15 09:12:40.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f0b7d42'
+down_revision = 'a751120aa9cb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job_log', schema=None) as batch_op:
+        batch_op.create_index('ix_joblog_job_ts', ['job_id', 'timestamp'], unique=False)
+        batch_op.drop_index('ix_job_log_job_id', if_exists=True)
+
+
+def downgrade():
+    with op.batch_alter_table('job_log', schema=None) as batch_op:
+        batch_op.create_index('ix_job_log_job_id', ['job_id'], unique=False)
+        batch_op.drop_index('ix_joblog_job_ts')
@@ -0,0 +1,26 @@
+"""job.email_status for background order emails
+
+Revision ID: 4b8f2d6a9c17
+Revises: 9d5e1b7c3f48
+Create Date: 2026-10-15 19:12:30.845172
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8f2d6a9c17'
+down_revision = '9d5e1b7c3f48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('email_status', sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_column('email_status')
@@ -0,0 +1,34 @@
+"""Indexes for the active / completed job lists
+
+Revision ID: 5e7a9c3b2d18
+Revises: 8b2d4e6a1f90
+Create Date: 2026-10-15 10:21:37.904112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7a9c3b2d18'
+down_revision = '8b2d4e6a1f90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.create_index('ix_job_stage_received_created', ['stage', 'received_date', 'created_at'], unique=False)
+        batch_op.create_index(
+            'ix_job_active',
+            ['received_date', 'created_at'],
+            unique=False,
+            sqlite_where=sa.text("stage != 'Completed'"),
+            postgresql_where=sa.text("stage != 'Completed'"),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_active')
+        batch_op.drop_index('ix_job_stage_received_created')
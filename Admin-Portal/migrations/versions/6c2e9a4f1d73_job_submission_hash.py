@@ -0,0 +1,28 @@
+"""job.submission_hash for website intake dedupe
+
+Revision ID: 6c2e9a4f1d73
+Revises: 4b8f2d6a9c17
+Create Date: 2026-10-15 20:41:07.318254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2e9a4f1d73'
+down_revision = '4b8f2d6a9c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submission_hash', sa.String(length=32), nullable=True))
+        batch_op.create_index('ux_job_submission_hash', ['submission_hash'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_index('ux_job_submission_hash')
+        batch_op.drop_column('submission_hash')
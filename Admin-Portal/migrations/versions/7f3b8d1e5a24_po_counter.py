@@ -0,0 +1,40 @@
+"""po_counter table for atomic PO sequence allocation
+
+Revision ID: 7f3b8d1e5a24
+Revises: d41f7a2c9e63
+Create Date: 2026-10-15 14:37:52.630918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3b8d1e5a24'
+down_revision = 'd41f7a2c9e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('po_counter',
+    sa.Column('date_key', sa.String(length=6), nullable=False),
+    sa.Column('last_seq', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('date_key')
+    )
+    # Carry on from the highest PO already issued for each day
+    op.execute(
+        "INSERT INTO po_counter (date_key, last_seq) "
+        "SELECT po_date_key, MAX(po_seq) FROM job GROUP BY po_date_key"
+    )
+
+    # Allocation no longer scans job for MAX(po_seq)
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_po')
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.create_index('ix_job_po', ['po_date_key', 'po_seq'], unique=False)
+
+    op.drop_table('po_counter')
@@ -0,0 +1,38 @@
+"""ON DELETE CASCADE for job_line_item / job_log
+
+Revision ID: 8b2d4e6a1f90
+Revises: 3c9e1f0b7d42
+Create Date: 2026-10-15 09:48:03.117402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d4e6a1f90'
+down_revision = '3c9e1f0b7d42'
+branch_labels = None
+depends_on = None
+
+# SQLite reflects the existing FKs without names; give them one so batch mode can drop them
+naming_convention = {
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+}
+
+
+def _recreate_job_fk(table: str, ondelete):
+    name = f"fk_{table}_job_id_job"
+    with op.batch_alter_table(table, schema=None, naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(name, 'job', ['job_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _recreate_job_fk('job_line_item', 'CASCADE')
+    _recreate_job_fk('job_log', 'CASCADE')
+
+
+def downgrade():
+    _recreate_job_fk('job_log', None)
+    _recreate_job_fk('job_line_item', None)
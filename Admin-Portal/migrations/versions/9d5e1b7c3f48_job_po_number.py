@@ -0,0 +1,41 @@
+"""Denormalized job.po_number
+
+Revision ID: 9d5e1b7c3f48
+Revises: 2a6c4e8f0b35
+Create Date: 2026-10-15 17:48:03.552916
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d5e1b7c3f48'
+down_revision = '2a6c4e8f0b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NOT NULL via a server default: SQLite can ADD COLUMN that in place, where
+    # a later alter_column(nullable=False) would rebuild job.
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('po_number', sa.String(length=10), nullable=False, server_default=''))
+
+    # Same MMDDYY-NN format as format_po_number() (po_seq is 1..99)
+    op.execute(
+        "UPDATE job SET po_number = po_date_key || '-' || "
+        "CASE WHEN po_seq < 10 THEN '0' ELSE '' END || CAST(po_seq AS VARCHAR(2))"
+    )
+
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        # The model has no default; drop it where that doesn't mean a rebuild
+        if op.get_bind().dialect.name != 'sqlite':
+            batch_op.alter_column('po_number', existing_type=sa.String(length=10), server_default=None)
+        batch_op.create_index(batch_op.f('ix_job_po_number'), ['po_number'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_job_po_number'))
+        batch_op.drop_column('po_number')
@@ -0,0 +1,30 @@
+"""Composite (po_date_key, po_seq) index for PO allocation
+
+Revision ID: d41f7a2c9e63
+Revises: 5e7a9c3b2d18
+Create Date: 2026-10-15 13:02:11.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f7a2c9e63'
+down_revision = '5e7a9c3b2d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.create_index('ix_job_po', ['po_date_key', 'po_seq'], unique=False)
+
+    # The composite index leads with po_date_key, so the single-column one is redundant.
+    op.execute('DROP INDEX IF EXISTS ix_job_po_date_key')
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.create_index('ix_job_po_date_key', ['po_date_key'], unique=False)
+        batch_op.drop_index('ix_job_po')
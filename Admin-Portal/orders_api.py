@@ -5,24 +5,31 @@ from __future__ import annotations
 # Crown Admin Portal - Order Intake API
 # =========================================
 # - Accepts multipart/form-data (FormData) including optional file uploads
-# - Builds a PDF summary (ReportLab) via pdf_utils.build_order_pdf_bytes()
-# - Sends email(s) via email_utils.send_order_emails()
+# - Inserts the Job, then answers 202; process_order() builds the PDF summary
+#   (pdf_utils.build_order_pdf_bytes) and sends the email(s)
+#   (email_utils.send_order_emails) on the background sender
 # - Does NOT require DB/models yet (order stored as dict + generated order_id)
 # =========================================
 
-import json
+import hashlib
 import os
-import uuid
-from datetime import datetime, timezone, date
+import secrets
+import shutil
+from datetime import datetime, timedelta, timezone, date
+from functools import lru_cache
 
+import click
+import orjson
 from flask import Blueprint, current_app, jsonify, request
 from werkzeug.utils import secure_filename
 
 from pdf_utils import build_order_pdf_bytes
-from email_utils import send_order_emails
+from email_utils import send_order_emails, submit_mail_task
+from sqlalchemy import insert, select, update
 from sqlalchemy.exc import IntegrityError
 
-orders_api = Blueprint("orders_api", __name__, url_prefix="/api")
+# cli_group=None: the blueprint's commands sit at the top level (`flask send-queued-orders`)
+orders_api = Blueprint("orders_api", __name__, url_prefix="/api", cli_group=None)
 
 # ---- Upload allow-list (keep conservative; expand as needed)
 ALLOWED_EXTS = {
@@ -30,14 +37,19 @@ ALLOWED_EXTS = {
     ".ai", ".eps", ".psd", ".tif", ".tiff", ".svg",
     ".zip", ".rar", ".txt"
 }
+_ALLOWED_SUFFIXES = tuple(ALLOWED_EXTS)
 
 def _parse_ymd_date(val: str):
     """Parse YYYY-MM-DD from <input type="date">. Returns date or None."""
     if not val:
         return None
+    s = str(val).strip()
+    # fromisoformat also takes compact and week dates; accept only YYYY-MM-DD
+    if len(s) != 10 or s[4] != "-" or s[7] != "-":
+        return None
     try:
-        return datetime.strptime(str(val).strip(), "%Y-%m-%d").date()
-    except Exception:
+        return date.fromisoformat(s)
+    except ValueError:
         return None
 
 def _format_items_for_text(items: list[dict]) -> str:
@@ -148,23 +160,70 @@ def _build_job_title(order_type: str, form_fields: dict) -> str:
     return "Website Large Project" + (f" — {core}" if core else "")
 
 def _allowed(filename: str) -> bool:
-    _, ext = os.path.splitext(filename.lower())
-    return ext in ALLOWED_EXTS
+    return filename.lower().endswith(_ALLOWED_SUFFIXES)
+
+
+# Spool files are created 0600; kept uploads get the mode a plain save would
+# (the front-end server may read them for X-Accel-Redirect downloads).
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _store_upload(f, path: str) -> None:
+    """Keep an upload at path: hard-link its spool file when possible, else copy."""
+    spooled = getattr(f.stream, "name", None)
+    if isinstance(spooled, str):
+        try:
+            f.stream.flush()
+            try:
+                os.link(spooled, path)
+            except OSError:
+                # Upload dir on a filesystem without hard links (e.g. some network or
+                # FAT mounts): copyfile uses sendfile(2) on Linux, so the bytes are
+                # copied in the kernel, not through Python buffers
+                shutil.copyfile(spooled, path)
+            os.chmod(path, 0o666 & ~_UMASK)
+            return
+        except OSError:
+            pass
+    # Copy fallback: design files run to many MB, so use 1 MiB chunks over the 16 KiB default
+    f.save(path, buffer_size=1 << 20)
+
+
+@lru_cache(maxsize=None)
+def _portal():
+    """The app module (db, models, PO helpers), imported once on first use.
+
+    app.py registers this blueprint at import time, so it can't be imported
+    at the top of this module.
+    """
+    import app
+
+    return app
 
 
 def _po_key_for_date(d: date) -> str:
     """Generate PO key in MMDDYY format"""
-    return d.strftime("%m%d%y")
+    return _portal().date_key_mmddyy(d)
 
 
 def _next_po_seq(po_date_key: str) -> int:
-    """Get next sequence number for a given PO date key"""
-    from app import db, Job
-    
-    result = db.session.query(db.func.max(Job.po_seq)).filter(
-        Job.po_date_key == po_date_key
-    ).scalar()
-    return (result or 0) + 1
+    """Claim the next sequence number for a given PO date key"""
+    return _portal().allocate_po_seq(po_date_key)
+
+
+def _submission_hash(day: date, form_fields: dict, uploads: list[str]) -> str:
+    """Fingerprint of one day's submission: form values + upload names/sizes.
+
+    The day is part of the key so a customer repeating an order later still gets
+    a new job; only same-day resubmits (double-clicks, retries) collide.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(day.isoformat().encode())
+    h.update(orjson.dumps(form_fields, option=orjson.OPT_SORT_KEYS))
+    for u in uploads:
+        h.update(b"|" + u.encode())
+    return h.hexdigest()
 
 
 def _insert_job_from_intake(
@@ -173,24 +232,21 @@ def _insert_job_from_intake(
     form_fields: dict,
     items: list,
     saved_files: list,
+    submission_hash: str | None = None,
 ) -> int:
     """Insert a new job from website intake form"""
-    from app import db, Job, JobLog
-    
-    received = date.today()
+    portal = _portal()
+    db, Job, JobLog, JobLineItem = portal.db, portal.Job, portal.JobLog, portal.JobLineItem
+
     created = datetime.now()
+    received = created.date()
 
-    needed_by_date = _parse_ymd_date(form_fields.get('needed_by'))
+    # Blank form values as None (create_order has already stripped them)
+    ff = {k: v or None for k, v in form_fields.items()}
 
     po_key = _po_key_for_date(received)
     po_seq = _next_po_seq(po_key)
 
-    customer_name = (form_fields.get("name") or "").strip() or "Website Customer"
-    business_name = (form_fields.get("company") or "").strip()
-    phone_number = (form_fields.get("phone") or "").strip()
-    email_address = (form_fields.get("email") or "").strip()
-
-    summary = (form_fields.get("summary") or "").strip()
     job_title = _build_job_title(order_type, form_fields)
 
     # Store both a readable summary and the raw JSON payload
@@ -206,46 +262,46 @@ def _insert_job_from_intake(
 
     job_details = _build_human_job_details(order_type, form_fields, items, saved_files)
 
-    # Create the job
-    job = Job(
-        customer_name=customer_name,
-        business_name=business_name if business_name else None,
-        phone_number=phone_number if phone_number else None,
-        email_address=email_address if email_address else None,
+    # Create the job. A plain INSERT ... RETURNING: the row is never touched
+    # again in this request, so there's nothing for an ORM instance to track.
+    job_id = db.session.execute(insert(Job).returning(Job.id), dict(
+        customer_name=ff.get("name") or "Website Customer",
+        business_name=ff.get("company"),
+        phone_number=ff.get("phone"),
+        email_address=ff.get("email"),
         job_title=job_title,
-        job_summary=summary if summary else None,
+        job_summary=ff.get("summary"),
         job_details=job_details,
-        needed_by_date=needed_by_date,
-        address_1=(form_fields.get("address") or "").strip() or None,
-        city=(form_fields.get("city") or "").strip() or None,
-        state=(form_fields.get("state") or "").strip() or None,
-        zip_code=(form_fields.get("zip") or "").strip() or None,
-        cell=(form_fields.get("cell") or "").strip() or None,
-        vehicle_make=(form_fields.get("make") or "").strip() or None,
-        vehicle_model=(form_fields.get("model") or "").strip() or None,
-        vin=(form_fields.get("vin") or "").strip() or None,
-        unit_number=(form_fields.get("unit_number") or "").strip() or None,
-        mfd_date=_parse_ymd_date(form_fields.get("mfd_date")),
+        needed_by_date=_parse_ymd_date(ff.get("needed_by")),
+        address_1=ff.get("address"),
+        city=ff.get("city"),
+        state=ff.get("state"),
+        zip_code=ff.get("zip"),
+        cell=ff.get("cell"),
+        vehicle_make=ff.get("make"),
+        vehicle_model=ff.get("model"),
+        vin=ff.get("vin"),
+        unit_number=ff.get("unit_number"),
+        mfd_date=_parse_ymd_date(ff.get("mfd_date")),
         quote_amount=None,
         received_date=received,
         created_at=created,
         stage="Received",
         po_date_key=po_key,
         po_seq=po_seq,
+        po_number=portal.format_po_number(po_key, po_seq),
         is_new=1,
         source="website",
+        email_status="queued",
         intake_order_id=order_id,
-        submission_json=json.dumps(submission_payload),
-        uploaded_files_json=json.dumps(saved_files),
-    )
+        submission_hash=submission_hash,
+        submission_json=submission_payload,
+        uploaded_files_json=saved_files,
+    )).scalar_one()
 
-    db.session.add(job)
-    db.session.flush()  # Flush to get the job_id before commit
-    job_id = job.id
-
-    # Create line items from intake rows
+    # Create line items from intake rows (one multi-row INSERT)
     try:
-        from app import JobLineItem
+        line_rows = []
         for row in items or []:
             qty_raw = (row.get('qty') or '').strip()
             try:
@@ -260,27 +316,108 @@ def _insert_job_from_intake(
                 parts.append(f"Material: {material}")
             if notes:
                 parts.append(f"Notes: {notes}")
-            li = JobLineItem(job_id=job_id, qty=qty_val, description='\n'.join(parts) if parts else None)
-            db.session.add(li)
-        db.session.flush()
+            line_rows.append({"job_id": job_id, "qty": qty_val, "description": '\n'.join(parts) if parts else None})
+        if line_rows:
+            db.session.execute(insert(JobLineItem), line_rows)
     except Exception:
         current_app.logger.exception('Failed to create line items from intake')
 
     # Create the log entry
-    log_entry = JobLog(
+    db.session.execute(insert(JobLog), dict(
         job_id=job_id,
         timestamp=created,
         actor_username="website",
         action="created",
         details=f"Created from website intake order_id={order_id}",
-    )
-
-    db.session.add(log_entry)
+    ))
     db.session.commit()
 
     return job_id
 
 
+def _order_from_submission(payload: dict) -> dict:
+    """Rebuild the order dict the PDF and emails use from Job.submission_json."""
+    fields = payload.get("fields") or {}
+    return {
+        "order_id": payload.get("order_id", ""),
+        "order_type": payload.get("order_type", ""),
+        "name": (fields.get("name") or "").strip(),
+        "email": (fields.get("email") or "").strip(),
+        "phone": fields.get("phone", "") or "",
+        "company": fields.get("company", "") or "",
+        "created_at": payload.get("created_at", ""),
+        "uploaded_files": payload.get("saved_files") or [],
+        "payload": fields,
+    }
+
+
+def process_order(job_id: int) -> bool:
+    """
+    Build the order PDF and send the order emails for an intake job, then
+    record Job.email_status ('sent' / 'failed'). Runs on the background sender
+    and from `flask send-queued-orders`.
+
+    The job is claimed first (queued/failed -> sending) in one UPDATE, so the
+    two can't both send it. Returns False if someone else already had it.
+    """
+    portal = _portal()
+    db, Job = portal.db, portal.Job
+
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.email_status.in_(("queued", "failed")))
+        .values(email_status="sending")
+    ).rowcount
+    db.session.commit()
+    if claimed != 1:
+        return False
+
+    payload = db.session.execute(select(Job.submission_json).where(Job.id == job_id)).scalar_one_or_none() or {}
+    order = _order_from_submission(payload)
+    items = payload.get("items") or []
+
+    status = "sent"
+    try:
+        pdf_bytes = build_order_pdf_bytes(order, items=items)
+        send_order_emails(order, items, pdf_bytes, order["uploaded_files"])
+    except Exception:
+        current_app.logger.exception("Order PDF/email failed for job %s", job_id)
+        status = "failed"
+
+    db.session.execute(update(Job).where(Job.id == job_id).values(email_status=status))
+    db.session.commit()
+    return True
+
+
+@orders_api.cli.command("send-queued-orders")
+@click.option("--older-than", default=10, show_default=True, help="Minutes since intake before a queued order is picked up.")
+@click.option("--include-failed", is_flag=True, help="Retry orders whose last send failed as well.")
+def send_queued_orders_command(older_than: int, include_failed: bool):
+    """Run process_order for website orders whose emails never went out.
+
+    The background sender lives in the web process, so a restart between the
+    202 and the send leaves the job at email_status='queued'. The job row is the
+    record of that pending work; run this from cron/a systemd timer to finish it.
+    A crash mid-send leaves 'sending', which is left for a person to check.
+    """
+    portal = _portal()
+    db, Job = portal.db, portal.Job
+
+    statuses = ["queued", "failed"] if include_failed else ["queued"]
+    cutoff = datetime.now() - timedelta(minutes=older_than)
+    job_ids = db.session.execute(
+        select(Job.id).where(Job.email_status.in_(statuses), Job.created_at < cutoff).order_by(Job.id)
+    ).scalars().all()
+
+    for job_id in job_ids:
+        if not process_order(job_id):
+            click.echo(f"job {job_id}: skipped, already being sent")
+            continue
+        status = db.session.execute(select(Job.email_status).where(Job.id == job_id)).scalar_one()
+        click.echo(f"job {job_id}: {status}")
+    click.echo(f"{len(job_ids)} order(s) processed.")
+
+
 @orders_api.post("/orders")
 def create_order():
     """
@@ -291,78 +428,76 @@ def create_order():
       - items_json: JSON string (array of rows)
       - files: 0..N uploads in field name "files"
     """
+    # Spool uploads into the upload dir itself (see PortalRequest) before the
+    # body is parsed, so kept files are linked into place instead of copied.
+    upload_dir = current_app.config.get("ORDER_UPLOAD_DIR", "uploads/orders")
+    os.makedirs(upload_dir, exist_ok=True)
+    request.upload_spool_dir = upload_dir
+    now_utc = datetime.now(timezone.utc)
+    day_prefix = now_utc.strftime("%Y%m%d")
+
     # -----------------------------
     # Parse form fields
     # -----------------------------
-    form = request.form.to_dict(flat=True)
-    order_type = (form.get("order_type", "") or "").strip().lower()
+    # One pass over the form: first value per field, stripped. Everything below
+    # (validation, job insert, dedupe hash, stored payload) uses this dict.
+    raw = request.form
+    form = {k: raw[k].strip() for k in raw}
+    order_type = form.get("order_type", "").lower()
     if order_type not in {"quick", "large"}:
         return jsonify({"ok": False, "error": "Invalid order_type (must be 'quick' or 'large')"}), 400
 
-    customer_name = (form.get("name", "") or "").strip()
-    customer_email = (form.get("email", "") or "").strip()
+    customer_name = form.get("name", "")
+    customer_email = form.get("email", "")
     if not customer_name or not customer_email:
         return jsonify({"ok": False, "error": "Missing required customer info (name/email)"}), 400
 
-    items_json = form.get("items_json", "[]") or "[]"
+    items_json = form.get("items_json") or "[]"
 
     # -----------------------------
     # Save uploads (optional)
     # -----------------------------
-    upload_dir = current_app.config.get("ORDER_UPLOAD_DIR", "uploads/orders")
-    os.makedirs(upload_dir, exist_ok=True)
-
     saved_files: list[str] = []
+    upload_sig: list[str] = []
     for f in request.files.getlist("files"):
         if not f or not getattr(f, "filename", ""):
             continue
-        fname = secure_filename(f.filename)
-        if not fname:
-            continue
-        if not _allowed(fname):
+        # Extension check first: rejected files skip secure_filename's normalising
+        if not _allowed(f.filename):
             # silently ignore disallowed ext (or return 400 if you prefer)
             continue
+        fname = secure_filename(f.filename)
+        # Sanitising can still eat the dot (".pdf" -> "pdf"): check the final name too
+        if not fname or not _allowed(fname):
+            continue
 
-        uid = uuid.uuid4().hex[:10]
-        stored = f"{datetime.now(timezone.utc).strftime('%Y%m%d')}_{uid}_{fname}"
+        uid = secrets.token_hex(5)
+        stored = f"{day_prefix}_{uid}_{fname}"
         path = os.path.join(upload_dir, stored)
-        f.save(path)
+        _store_upload(f, path)
         saved_files.append(path)
+        upload_sig.append(f"{fname}:{os.path.getsize(path)}")
 
     # -----------------------------
-    # Build in-memory order object (no DB yet)
+    # Order id
     # -----------------------------
-    order_id = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
-
-    order_data = {
-        "order_id": order_id,
-        "order_type": order_type,
-        "name": customer_name,
-        "email": customer_email,
-        "phone": form.get("phone", "") or "",
-        "company": form.get("company", "") or "",
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "items_json": items_json,
-        "uploaded_files": saved_files,
-        "payload": dict(form),
-    }
+    order_id = now_utc.strftime("%Y%m%d-%H%M%S") + "-" + secrets.token_hex(3)
 
     # -----------------------------
-    # Parse items_json into a list for PDF/email
+    # Parse items_json into a list for line items / PDF / email
     # -----------------------------
-    items: list[dict] = []
     try:
-        parsed = json.loads(items_json) if items_json else []
-        if isinstance(parsed, list):
-            # ensure dict rows
-            items = [row for row in parsed if isinstance(row, dict)]
-    except Exception:
-        current_app.logger.exception("Invalid items_json; defaulting to empty list")
-        items = []
+        parsed = orjson.loads(items_json)
+    except orjson.JSONDecodeError:
+        current_app.logger.warning("Invalid items_json; defaulting to empty list")
+        parsed = []
+    # Only a list of objects is accepted; stray non-dict rows are dropped
+    items: list[dict] = [row for row in parsed if isinstance(row, dict)] if isinstance(parsed, list) else []
 
     # -----------------------------
     # Save to database (insert first to avoid double-email on duplicate)
     # -----------------------------
+    sub_hash = _submission_hash(now_utc.date(), form, upload_sig)
     job_id = None
     db_error = None
     deduped = False
@@ -373,14 +508,30 @@ def create_order():
             form_fields=form,
             items=items,
             saved_files=saved_files,
+            submission_hash=sub_hash,
         )
-    except IntegrityError:
-        # Likely duplicate intake_order_id - fetch existing job and skip re-sending emails
-        current_app.logger.warning("Duplicate intake_order_id detected; deduping")
-        from app import db, Job
-        existing = db.session.query(Job).filter_by(intake_order_id=order_id).first()
-        job_id = existing.id if existing else None
+    except IntegrityError as e:
+        portal = _portal()
+        db, Job = portal.db, portal.Job
+        db.session.rollback()
+        existing = db.session.execute(
+            select(Job.id, Job.intake_order_id).where(Job.submission_hash == sub_hash)
+        ).first()
+        if existing is None:
+            # Some other constraint failed: not a duplicate, so the order wasn't stored
+            current_app.logger.exception("Database insert failed")
+            return jsonify({"ok": False, "error": "DB insert failed", "db_error": str(e)}), 500
+
+        # Same submission already stored today - point at that job, skip re-sending emails
+        current_app.logger.warning("Duplicate website submission detected; deduping")
+        job_id, order_id = existing
         deduped = True
+        # This copy's uploads belong to no job
+        for path in saved_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
     except Exception as e:
         current_app.logger.exception("Database insert failed")
         db_error = str(e)
@@ -390,26 +541,12 @@ def create_order():
         return jsonify({"ok": True, "order_id": order_id, "job_id": job_id, "deduped": True}), 200
 
     # -----------------------------
-    # Build PDF (if PDF build fails, treat as server error)
+    # PDF + emails happen in the background; process_order records the outcome
     # -----------------------------
-    pdf_bytes = build_order_pdf_bytes(order_data, items=items)
-
-    # -----------------------------
-    # Send emails (do NOT fail request if email fails)
-    # -----------------------------
-    email_sent = False
-    email_error = None
     try:
-        send_order_emails(
-            order=order_data,
-            items=items,
-            pdf_bytes=pdf_bytes,
-            uploaded_paths=saved_files,
-        )
-        email_sent = True
-    except Exception as e:
-        current_app.logger.exception("Order email failed")
-        email_error = str(e)
+        submit_mail_task(process_order, job_id)
+    except Exception:
+        current_app.logger.exception("Could not queue order PDF/email for job %s", job_id)
 
     # -----------------------------
     # Response
@@ -418,7 +555,5 @@ def create_order():
         "ok": True,
         "order_id": order_id,
         "job_id": job_id,
-        "email_sent": email_sent,
-        "email_error": email_error,
-        "db_error": db_error,
-    }), 201
+        "email_status": "queued",
+    }), 202
@@ -9,6 +9,7 @@ from __future__ import annotations
 
 from io import BytesIO
 from datetime import datetime
+from textwrap import TextWrapper
 
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
@@ -18,7 +19,20 @@ from reportlab.pdfgen import canvas
 def _safe(s) -> str:
     if s is None:
         return ""
-    return str(s)
+    # form values are already str: skip the str() call
+    return s if type(s) is str else str(s)
+
+
+# Line wrap for the long item columns: whole words only, a word wider than
+# the column stays on its own line.
+_DESC_WRAP = TextWrapper(width=42, break_long_words=False, break_on_hyphens=False)
+_NOTES_WRAP = TextWrapper(width=28, break_long_words=False, break_on_hyphens=False)
+
+
+def _wrap(wrapper: TextWrapper, text: str) -> list[str]:
+    if len(text) <= wrapper.width:
+        return [text]
+    return wrapper.wrap(text) or [""]
 
 
 def build_order_pdf_bytes(order: dict, items: list[dict]) -> bytes:
@@ -72,21 +86,35 @@ def build_order_pdf_bytes(order: dict, items: list[dict]) -> bytes:
     c.drawString(margin, y, "Requested Items")
     y -= 0.22 * inch
 
-    c.setFont("Helvetica-Bold", 9)
     col_qty = margin
     col_desc = margin + 0.7 * inch
     col_mat = margin + 3.9 * inch
     col_notes = margin + 5.4 * inch
 
-    c.drawString(col_qty, y, "Qty")
-    c.drawString(col_desc, y, "Description")
-    c.drawString(col_mat, y, "Material")
-    c.drawString(col_notes, y, "Notes")
-    y -= 0.12 * inch
-
+    # Column titles + rule: drawn once as a form XObject, placed on every page
+    # with doForm. The form is clipped to its BBox (the page, from y=0), so the
+    # rule sits a little above 0 to keep all of its 0.5pt stroke inside; form
+    # coordinates: rule at hdr_rule_y, titles 0.12in above it.
+    hdr_rule_y = 0.02 * inch
+    c.beginForm("itemsHeader")
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(col_qty, hdr_rule_y + 0.12 * inch, "Qty")
+    c.drawString(col_desc, hdr_rule_y + 0.12 * inch, "Description")
+    c.drawString(col_mat, hdr_rule_y + 0.12 * inch, "Material")
+    c.drawString(col_notes, hdr_rule_y + 0.12 * inch, "Notes")
     c.setLineWidth(0.5)
-    c.line(margin, y, width - margin, y)
-    y -= 0.14 * inch
+    c.line(margin, hdr_rule_y, width - margin, hdr_rule_y)
+    c.endForm()
+
+    def items_header(y):
+        y -= 0.12 * inch
+        c.saveState()
+        c.translate(0, y - hdr_rule_y)
+        c.doForm("itemsHeader")
+        c.restoreState()
+        return y - 0.14 * inch
+
+    y = items_header(y)
 
     c.setFont("Helvetica", 9)
 
@@ -100,25 +128,8 @@ def build_order_pdf_bytes(order: dict, items: list[dict]) -> bytes:
             mat = _safe(row.get("material", ""))
             notes = _safe(row.get("notes", ""))
 
-            # simple line wrap for long fields
-            def wrap(text, max_chars):
-                if len(text) <= max_chars:
-                    return [text]
-                words = text.split()
-                lines, cur = [], ""
-                for w in words:
-                    if len(cur) + len(w) + 1 <= max_chars:
-                        cur = (cur + " " + w).strip()
-                    else:
-                        if cur:
-                            lines.append(cur)
-                        cur = w
-                if cur:
-                    lines.append(cur)
-                return lines
-
-            desc_lines = wrap(desc, 42)
-            notes_lines = wrap(notes, 28)
+            desc_lines = _wrap(_DESC_WRAP, desc)
+            notes_lines = _wrap(_NOTES_WRAP, notes)
             row_lines = max(len(desc_lines), len(notes_lines), 1)
 
             for i in range(row_lines):
@@ -128,14 +139,7 @@ def build_order_pdf_bytes(order: dict, items: list[dict]) -> bytes:
                     c.setFont("Helvetica-Bold", 12)
                     c.drawString(margin, y, "Requested Items (cont.)")
                     y -= 0.22 * inch
-                    c.setFont("Helvetica-Bold", 9)
-                    c.drawString(col_qty, y, "Qty")
-                    c.drawString(col_desc, y, "Description")
-                    c.drawString(col_mat, y, "Material")
-                    c.drawString(col_notes, y, "Notes")
-                    y -= 0.12 * inch
-                    c.line(margin, y, width - margin, y)
-                    y -= 0.14 * inch
+                    y = items_header(y)
                     c.setFont("Helvetica", 9)
 
                 if i == 0:
@@ -155,5 +159,5 @@ def build_order_pdf_bytes(order: dict, items: list[dict]) -> bytes:
     c.showPage()
     c.save()
 
-    buf.seek(0)
-    return buf.read()
+    # getvalue() hands back the buffer; seek(0) + read() made a second copy
+    return buf.getvalue()
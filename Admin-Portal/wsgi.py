@@ -0,0 +1,36 @@
+# =========================================
+# wsgi.py
+# Crown Admin Portal - WSGI entry point
+# =========================================
+# Production:
+#   gunicorn -w 4 --preload --worker-class gthread --threads 8 -b 127.0.0.1:8000 wsgi:app
+#
+# --preload imports app.py once in the master, so the engine, ORM mappers and
+# compiled templates are built once and shared copy-on-write by the workers.
+# The database (and first admin user) is created once, outside any request:
+#   flask --app wsgi init-db      (or `flask db upgrade` on an existing install)
+#
+# Upload downloads (/uploads/orders/...) can be handed to nginx so the bytes
+# go out via sendfile(2) instead of through a gunicorn worker. Set
+# X_ACCEL_REDIRECT_PREFIX=/_protected/orders/ and add:
+#
+#   location /_protected/orders/ {
+#       internal;
+#       alias /path/to/uploads/orders/;   # = ORDER_UPLOAD_DIR
+#   }
+#
+# (Apache/lighttpd: USE_X_SENDFILE=1 instead.) Flask still does the login
+# check and path validation; without either setting it serves the file itself.
+#
+# Order PDFs/emails are sent by a thread inside the web process; orders caught
+# by a restart stay at email_status='queued'. Pick them up from a timer:
+#   flask --app wsgi send-queued-orders        (--include-failed to retry failures)
+#
+# SQLite notes: connections run in WAL mode with a 30 s busy timeout, so the
+# workers' writes queue on the database lock instead of failing. Keep the
+# worker count modest; move to Postgres before scaling out further.
+# =========================================
+
+from app import app
+
+__all__ = ["app"]